@@ -1,79 +1,134 @@
 import gradio as gr
-from gradio.components import ChatMessage
 import os
+import json
+import httpx
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from google import genai
+from google.genai import types
+
+# Parse YAML with libyaml when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 from ingest import get_or_create_store, create_ingest_ui
 from chat import init_db, create_chat_ui
 
 # --- Configuration ---
+def _load_yaml_cached(path):
+    """Parses a YAML file, reusing a JSON copy from an earlier run if it matches the file's stat."""
+    stat = os.stat(path)
+    key = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+    cache_path = path + ".cache.json"
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            if json.loads(f.readline()) == key:
+                return json.loads(f.read())
+    except (OSError, ValueError):
+        pass
+
+    with open(path, "r") as f:
+        data = yaml.load(f, Loader=YamlLoader)
+
+    # The first line records which version of the file the cache was built from
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(key) + "\n")
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError) as e:
+        print(f"Could not write cache for {path}: {e}")
+    return data
+
+
 def load_config():
-    """Loads configuration from .env and prompts.yaml."""
-    load_dotenv()
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if not google_api_key:
-        raise ValueError("GOOGLE_API_KEY not found in .env file")
+    """Loads configuration from .env, prompts.yaml, and config.yaml, reading the three files concurrently."""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        env_future = executor.submit(load_dotenv)
+        prompts_future = executor.submit(_load_yaml_cached, "prompts.yaml")
+        config_future = executor.submit(_load_yaml_cached, "config.yaml")
 
-    with open("prompts.yaml", "r") as f:
-        prompts = yaml.safe_load(f)
+        env_future.result()
+        google_api_key = os.getenv("GOOGLE_API_KEY")
+        if not google_api_key:
+            raise ValueError("GOOGLE_API_KEY not found in .env file")
 
-    with open("config.yaml", "r") as f:
-        config = yaml.safe_load(f)
+        prompts = prompts_future.result()
+        config = config_future.result()
 
     return google_api_key, prompts, config
 
 # --- Gemini Client Initialization ---
-try:
-    GOOGLE_API_KEY, PROMPTS, CONFIG = load_config()
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-except (ValueError, FileNotFoundError) as e:
-    print(f"Error initializing the application: {e}")
-    # Exit or handle gracefully if running in a context that allows it
-    exit()
-
-# --- Configuration Values ---
-STORE_DISPLAY_NAME = CONFIG["file_search_store"]["display_name"]
-DB_NAME = CONFIG["database_name"]
-# # --- Clean up old stores ---
-# print("--- Cleaning up old File Search Stores ---")
-# store_to_keep_display_name = "aurora-code-analysis-store"
-# try:
-#     for store_item in client.file_search_stores.list():
-#         if store_item.display_name != store_to_keep_display_name:
-#             print(f"Deleting store: {store_item.display_name} ({store_item.name})")
-#             client.file_search_stores.delete(name=store_item.name, config={'force': True})
-#         else:
-#             print(f"Keeping store: {store_item.display_name}")
-# except Exception as e:
-#     print(f"An error occurred during store cleanup: {e}")
-# print("--- Cleanup Complete ---")
-
-store = get_or_create_store(client, STORE_DISPLAY_NAME)
-init_db(DB_NAME) # Initialize the database on startup
-
-# --- Gradio UI ---
-css = """
-.conversation-list-container {
-    max-height: 300px;
-    overflow-y: auto;
-    border: 1px solid #e0e0e0;
-    border-radius: 8px;
-}
-#visualization-output {
-    min-height: 600px;
-    overflow: auto;
-}
-"""
-with gr.Blocks(theme=gr.themes.Ocean(), css=css) as demo:
-    gr.Markdown("<h1 style='text-align: center;'>Aurora Codex</h1>")
-
-    # Create the Ingest tab by calling the function from ingest.py
-    create_ingest_ui(client, store, CONFIG)
-
-    # Create the Chat tab by calling the function from chat.py
-    create_chat_ui(client, store, PROMPTS, CONFIG)
+def create_client(api_key, config):
+    """
+    Creates the Gemini client shared by every module. Its connection pool keeps enough
+    connections alive for the configured number of concurrent uploads and chat streams.
+    """
+    server_config = config.get("server", {})
+    pool_size = (
+        server_config.get("ingest_concurrency_limit", 2) * config["ingestion"].get("max_workers", 8)
+        + server_config.get("chat_concurrency_limit", 8)
+    )
+    limits = httpx.Limits(max_connections=max(pool_size, 100), max_keepalive_connections=pool_size)
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(client_args={"limits": limits}))
+
+
+def create_app():
+    """Loads the configuration, connects to Gemini and the file search store, and builds the UI."""
+    try:
+        google_api_key, prompts, config = load_config()
+        client = create_client(google_api_key, config)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error initializing the application: {e}")
+        # Exit or handle gracefully if running in a context that allows it
+        exit()
+
+    # --- Configuration Values ---
+    store_display_name = config["file_search_store"]["display_name"]
+    db_name = config["database_name"]
+
+    store = get_or_create_store(client, store_display_name)
+    init_db(db_name) # Initialize the database on startup
+
+    # --- Gradio UI ---
+    css = """
+    .conversation-list-container {
+        max-height: 300px;
+        overflow-y: auto;
+        border: 1px solid #e0e0e0;
+        border-radius: 8px;
+    }
+    #visualization-output {
+        min-height: 600px;
+        overflow: auto;
+    }
+    """
+    with gr.Blocks(theme=gr.themes.Ocean(), css=css) as demo:
+        gr.Markdown("<h1 style='text-align: center;'>Aurora Codex</h1>")
+
+        # Create the Ingest tab by calling the function from ingest.py
+        create_ingest_ui(client, store, config)
+
+        # Create the Chat tab by calling the function from chat.py
+        create_chat_ui(client, store, prompts, config)
+
+    # Queue requests so long-running ingestion doesn't block chatting
+    server_config = config.get("server", {})
+    demo.queue(
+        default_concurrency_limit=server_config.get("default_concurrency_limit", 4),
+        max_size=server_config.get("max_queue_size", 32)
+    )
+    return demo
+
+
+# The knowledge graph's worker processes import this file as __mp_main__; they only need
+# code_analysis, so they skip connecting to the store and building the UI
+if __name__ != "__mp_main__":
+    demo = create_app()
 
 if __name__ == "__main__":
     demo.launch()
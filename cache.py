@@ -0,0 +1,212 @@
+import hashlib
+import math
+import operator
+import re
+import sqlite3
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from google.genai import types
+
+
+# Identifiers the user put in backticks, e.g. `parse_config`
+_IDENTIFIER_PATTERN = re.compile(r"`([^`]+)`")
+
+
+class SemanticCache:
+    """
+    An approximate-match cache for chat responses. Queries are embedded with Gemini and
+    compared by cosine similarity against previously answered queries, so repeated
+    questions can be answered without another round-trip to the model. Identical queries
+    are matched by hash first, which avoids the embedding call altogether. If a database
+    is given, query embeddings are also stored there so they survive restarts.
+    Questions that differ only in a named identifier embed almost identically, so a
+    similar query is only a hit if it names the same backticked identifiers.
+    """
+    def __init__(self, client, embedding_model, embedding_dimensions=768, similarity_threshold=0.92, ttl_seconds=300, max_entries=256, db_name=None):
+        self.client = client
+        self.embedding_model = embedding_model
+        self.embedding_dimensions = embedding_dimensions
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = []  # List of (embedding as float32 array, identifiers, response_text, created_at)
+        self._exact_entries = OrderedDict()  # sha256(query) -> (response_text, created_at)
+        self._embeddings = OrderedDict()  # Recently embedded queries, reused by put()
+        self._lock = threading.RLock()
+        self.db_name = db_name
+        self._db = None
+
+    def _get_db(self):
+        """Returns the connection used to persist embeddings, opening it on first use. Callers must hold _lock."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_name, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    q_sha TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL
+                )
+            """)
+        return self._db
+
+    def _load_embedding(self, key):
+        """Returns the persisted embedding for the key, or None if there isn't one."""
+        try:
+            with self._lock:
+                row = self._get_db().execute("SELECT embedding FROM query_embeddings WHERE q_sha = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error loading query embedding: {e}")
+            return None
+        if row is None or len(row[0]) != 2 * self.embedding_dimensions:
+            return None
+        # Embeddings are stored as half-precision floats, which is plenty for similarity search
+        return list(struct.unpack(f"<{self.embedding_dimensions}e", row[0]))
+
+    def _store_embedding(self, key, embedding):
+        """Persists the embedding under the key."""
+        try:
+            with self._lock:
+                db = self._get_db()
+                with db:
+                    db.execute(
+                        "INSERT OR IGNORE INTO query_embeddings (q_sha, embedding) VALUES (?, ?)",
+                        (key, struct.pack(f"<{len(embedding)}e", *embedding))
+                    )
+        except (sqlite3.Error, struct.error) as e:
+            print(f"Error saving query embedding: {e}")
+
+    def _embed(self, text):
+        """Embeds the text with Gemini and returns it as a unit-length vector."""
+        with self._lock:
+            if text in self._embeddings:
+                self._embeddings.move_to_end(text)
+                return self._embeddings[text]
+
+        # Embeddings depend on the model and size, so both are part of the persisted key
+        key = self._hash(f"{self.embedding_model}/{self.embedding_dimensions}/{text}") if self.db_name else None
+        embedding = self._load_embedding(key) if key else None
+        if embedding is None:
+            embedding = self._embed_remote(text)
+            if key:
+                self._store_embedding(key, embedding)
+
+        with self._lock:
+            self._embeddings[text] = embedding
+            if len(self._embeddings) > 64:
+                self._embeddings.popitem(last=False)
+        return embedding
+
+    def _embed_remote(self, text):
+        """Embeds the text with the Gemini API and normalizes it to unit length."""
+        response = self.client.models.embed_content(
+            model=self.embedding_model,
+            contents=text,
+            config=types.EmbedContentConfig(
+                task_type="SEMANTIC_SIMILARITY",
+                output_dimensionality=self.embedding_dimensions
+            )
+        )
+        vector = response.embeddings[0].values
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    @staticmethod
+    def _hash(query):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _identifiers(query):
+        return frozenset(_IDENTIFIER_PATTERN.findall(query))
+
+    def get(self, query):
+        """Returns the cached response for an identical or semantically similar query, or None on a miss."""
+        key = self._hash(query)
+        with self._lock:
+            exact = self._exact_entries.get(key)
+            if exact is not None:
+                if time.monotonic() - exact[1] < self.ttl_seconds:
+                    self._exact_entries.move_to_end(key)
+                    return exact[0]
+                del self._exact_entries[key]
+
+        try:
+            embedding = self._embed(query)
+        except Exception as e:
+            print(f"Error embedding query for semantic cache: {e}")
+            return None
+
+        with self._lock:
+            # Drop expired entries before searching
+            now = time.monotonic()
+            self._entries = [entry for entry in self._entries if now - entry[3] < self.ttl_seconds]
+
+            identifiers = self._identifiers(query)
+            best_response, best_score = None, self.similarity_threshold
+            for cached_embedding, cached_identifiers, response_text, _ in self._entries:
+                if cached_identifiers != identifiers:
+                    continue
+                score = sum(map(operator.mul, embedding, cached_embedding))
+                if score >= best_score:
+                    best_response, best_score = response_text, score
+            return best_response
+
+    def put(self, query, response_text):
+        """Stores the response for the query so similar queries can reuse it."""
+        try:
+            embedding = self._embed(query)
+        except Exception as e:
+            print(f"Error embedding query for semantic cache: {e}")
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            # Single precision takes an eighth of the memory of a list of floats and is
+            # plenty for comparing unit vectors
+            self._entries.append((array('f', embedding), self._identifiers(query), response_text, now))
+            if len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+
+            self._exact_entries[self._hash(query)] = (response_text, now)
+            if len(self._exact_entries) > 512:
+                self._exact_entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all cached responses, e.g. after the indexed codebase has changed."""
+        with self._lock:
+            self._entries.clear()
+            self._exact_entries.clear()
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(client, config):
+    """Returns the process-wide semantic cache, creating it on first use. Returns None if disabled."""
+    global _semantic_cache
+    cache_config = config.get("semantic_cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(
+                client,
+                embedding_model=cache_config.get("embedding_model", "gemini-embedding-001"),
+                embedding_dimensions=cache_config.get("embedding_dimensions", 768),
+                similarity_threshold=cache_config.get("similarity_threshold", 0.92),
+                ttl_seconds=cache_config.get("ttl_seconds", 300),
+                max_entries=cache_config.get("max_entries", 256),
+                db_name=config.get("database_name") if cache_config.get("persist_embeddings", True) else None
+            )
+        return _semantic_cache
+
+
+def invalidate_semantic_cache():
+    """Clears the semantic cache because the underlying file search store has changed."""
+    if _semantic_cache is not None:
+        _semantic_cache.clear()
@@ -1,12 +1,33 @@
 import sqlite3
+import threading
+import atexit
+import time
 from datetime import datetime
 import tempfile
 import json
+import hashlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from itertools import chain
 import os
 from gradio.components import ChatMessage
 import gradio as gr
 from google.genai import types
 
+from cache import get_semantic_cache
+
+try:
+    # Optional: matches every knowledge graph node ID against conversation text in one pass
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # Optional (installed with Gradio): parses large knowledge graph files faster than json
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # --- SQLite Datetime Adapters (for Python 3.12+ DeprecationWarning) ---
 def adapt_datetime_iso(val):
@@ -24,73 +45,320 @@ sqlite3.register_adapter(datetime, adapt_datetime_iso)
 sqlite3.register_converter("DATETIME", convert_datetime)
 
 # --- Database Management ---
+# Writes go through one long-lived connection per database, guarded by _db_lock.
+# Reads use a connection per worker thread, which WAL mode lets run alongside writes.
+_db_connections = {}
+_db_lock = threading.RLock()
+_read_connections = threading.local()
+
+# Chat history rows waiting to be written, keyed by database name.
+_pending_writes = {}
+_flush_timer = None
+_FLUSH_INTERVAL_SECONDS = 0.5
+_FLUSH_BATCH_SIZE = 16
+
+# Rows written since the query planner's statistics were last refreshed, keyed by database name
+_rows_since_analyze = {}
+_ANALYZE_INTERVAL_ROWS = 1000
+
+# Cached results of get_conversations and get_formatted_conversations, keyed by database name. Invalidated by writes.
+_conversations_cache = {}
+_formatted_conversations_cache = {}
+_CONVERSATION_LIST_LIMIT = 100  # Most recent conversations shown in the sidebar
+
+# Rows fetched per round-trip when streaming a conversation from the database
+_FETCH_BATCH_SIZE = 500
+
+# SQL for the hot paths. Each statement is always issued with the same text, so it is
+# prepared once per connection and then served from the connection's statement cache.
+_SQL_INSERT_MESSAGE = "INSERT INTO chat_history (conversation_id, timestamp, query, response) VALUES (?, ?, ?, ?)"
+# The first message of each conversation has the lowest id, since ids are assigned in
+# insertion order. This avoids joining on the timestamp.
+_SQL_SELECT_CONVERSATIONS = """
+    SELECT conversation_id, query
+    FROM chat_history
+    WHERE id IN (SELECT MIN(id) FROM chat_history GROUP BY conversation_id)
+    ORDER BY id DESC
+    LIMIT ?
+"""
+_SQL_SELECT_CONVERSATION = "SELECT query, response FROM chat_history WHERE conversation_id = ? ORDER BY timestamp ASC"
+_SQL_DELETE_CONVERSATION = "DELETE FROM chat_history WHERE conversation_id = ?"
+_SQL_DELETE_SUMMARY = "DELETE FROM conversation_summaries WHERE conversation_id = ?"
+_SQL_SELECT_SUMMARY = "SELECT summary FROM conversation_summaries WHERE conversation_id = ? AND message_count = ?"
+_SQL_UPSERT_SUMMARY = "INSERT OR REPLACE INTO conversation_summaries (conversation_id, message_count, summary) VALUES (?, ?, ?)"
+
+# Gemini-formatted history of recently loaded conversations, keyed by conversation_id
+_history_cache = OrderedDict()
+_HISTORY_CACHE_SIZE = 32
+
+# Live Gemini chat sessions, keyed by conversation_id, so reopening a recent conversation
+# continues its session instead of rebuilding it from history. Each is stored as
+# (session, name of the context cache it reads its history from or None, monotonic time last used).
+_chat_sessions = OrderedDict()
+_CHAT_SESSION_LIMIT = 32
+_chat_sessions_lock = threading.Lock()
+
+
+def _open_connection(db_name):
+    """Opens a connection to the database configured for concurrent access."""
+    conn = sqlite3.connect(db_name, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _get_conn(db_name):
+    """Returns the shared write connection for the database, opening it on first use. Callers must hold _db_lock."""
+    conn = _db_connections.get(db_name)
+    if conn is None:
+        conn = _db_connections[db_name] = _open_connection(db_name)
+    return conn
+
+
+def _get_read_conn(db_name):
+    """Returns this thread's read connection for the database, opening it on first use."""
+    connections = getattr(_read_connections, "connections", None)
+    if connections is None:
+        connections = _read_connections.connections = {}
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = connections[db_name] = _open_connection(db_name)
+    return conn
+
+
+def _flush_pending_writes(db_name=None):
+    """Writes buffered chat history rows in a single transaction per database."""
+    global _flush_timer
+    with _db_lock:
+        if db_name is None:
+            _flush_timer = None  # Called by the timer (or at exit), so it has fired
+        for name in [db_name] if db_name else list(_pending_writes):
+            rows = _pending_writes.pop(name, None)
+            if not rows:
+                continue
+            try:
+                conn = _get_conn(name)
+                with conn:
+                    conn.executemany(_SQL_INSERT_MESSAGE, rows)
+                _count_rows_written(name, conn, len(rows))
+            except sqlite3.Error as e:
+                print(f"Error adding to chat history: {e}")
+
+
+def _count_rows_written(db_name, conn, count):
+    """
+    Refreshes the query planner's statistics for chat_history once enough rows have been
+    written, so it keeps choosing the right indexes as the table grows. Callers must hold _db_lock.
+    """
+    written = _rows_since_analyze.get(db_name, 0) + count
+    if written >= _ANALYZE_INTERVAL_ROWS:
+        try:
+            conn.execute("ANALYZE chat_history")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error analyzing chat history: {e}")
+        written = 0
+    _rows_since_analyze[db_name] = written
+
+
+def _close_databases():
+    """Writes any buffered rows, then lets SQLite refresh stale statistics before exit."""
+    _flush_pending_writes()
+    with _db_lock:
+        for name, conn in _db_connections.items():
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                print(f"Error optimizing database {name}: {e}")
+
+
+# Make sure buffered rows reach the database when the app shuts down
+atexit.register(_close_databases)
+
+
+def _to_gemini_history(rows):
+    """Converts (query, response) rows to Gemini's Content format."""
+    gemini_history = []
+    for query, response in rows:
+        gemini_history.append(types.Content(role="user", parts=[types.Part(text=query)]))
+        gemini_history.append(types.Content(role="model", parts=[types.Part(text=response)]))
+    return gemini_history
+
+
+def _cache_history(conversation_id, gemini_history):
+    """Stores a conversation's Gemini history, evicting the least recently used entry."""
+    _history_cache[conversation_id] = gemini_history
+    _history_cache.move_to_end(conversation_id)
+    if len(_history_cache) > _HISTORY_CACHE_SIZE:
+        _history_cache.popitem(last=False)
+
+
+def _get_chat_session(conversation_id, max_age_seconds):
+    """
+    Returns the live (chat session, context cache name) for a conversation, or (None, None) if
+    there isn't one. Sessions unused for longer than max_age_seconds are dropped, since any
+    context cache they read from has expired by then.
+    """
+    with _chat_sessions_lock:
+        entry = _chat_sessions.get(conversation_id)
+        if entry is None:
+            return None, None
+        now = time.monotonic()
+        if now - entry[2] > max_age_seconds:
+            del _chat_sessions[conversation_id]
+            return None, None
+        _chat_sessions[conversation_id] = (entry[0], entry[1], now)
+        _chat_sessions.move_to_end(conversation_id)
+        return entry[0], entry[1]
+
+
+def _register_chat_session(conversation_id, chat_session, cache_name=None):
+    """Stores a conversation's chat session, evicting the least recently used one."""
+    with _chat_sessions_lock:
+        _chat_sessions[conversation_id] = (chat_session, cache_name, time.monotonic())
+        _chat_sessions.move_to_end(conversation_id)
+        if len(_chat_sessions) > _CHAT_SESSION_LIMIT:
+            _chat_sessions.popitem(last=False)
+
+
+def _drop_chat_session(conversation_id):
+    """Forgets a conversation's chat session, so the next message builds a new one."""
+    with _chat_sessions_lock:
+        _chat_sessions.pop(conversation_id, None)
+
+
+def _invalidate_conversations_cache(db_name):
+    """Drops the cached conversation list for the database."""
+    _conversations_cache.pop(db_name, None)
+    _formatted_conversations_cache.pop(db_name, None)
+
+
 def init_db(db_name):
     """Initializes the SQLite database and creates the history table if it doesn't exist."""
     print(f"--- Initializing Database: {db_name} ---")
     try:
-        with sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    conversation_id TEXT NOT NULL,
-                    timestamp DATETIME NOT NULL,
-                    query TEXT NOT NULL,
-                    response TEXT NOT NULL
-                )
-            """)
-            conn.commit()
+        with _db_lock:
+            conn = _get_conn(db_name)
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        conversation_id TEXT NOT NULL,
+                        timestamp DATETIME NOT NULL,
+                        query TEXT NOT NULL,
+                        response TEXT NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_conv_ts ON chat_history(conversation_id, timestamp)")
+                # No query filters or sorts on timestamp alone; drop the index older databases created
+                conn.execute("DROP INDEX IF EXISTS idx_chat_ts")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS conversation_summaries (
+                        conversation_id TEXT PRIMARY KEY,
+                        message_count INTEGER NOT NULL,
+                        summary TEXT NOT NULL
+                    )
+                """)
         print("Database initialized successfully.")
     except sqlite3.Error as e:
         print(f"Error initializing database: {e}")
 
 
+@contextmanager
+def chat_history_transaction(db_name):
+    """
+    Runs a group of writes on the shared connection as one transaction, after any buffered
+    rows have been written. Commits when the block finishes and rolls back if it raises.
+    """
+    with _db_lock:
+        _flush_pending_writes(db_name)
+        conn = _get_conn(db_name)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def _track_new_row(db_name, conversation_id, query, response):
+    """Keeps the in-memory caches in step with a newly added row. Callers must hold _db_lock."""
+    # Only a new conversation changes the list of conversations
+    cached = _conversations_cache.get(db_name)
+    if cached is None or not any(conv_id == conversation_id for conv_id, _ in cached):
+        _invalidate_conversations_cache(db_name)
+
+    if conversation_id in _history_cache:
+        _history_cache[conversation_id].extend(_to_gemini_history([(query, response)]))
+
+
 def add_chat_history(db_name, conversation_id, query, response):
-    """Adds a new chat interaction to the history database."""
+    """
+    Adds a new chat interaction to the history database. Rows are buffered and written
+    in batches, either once enough rows are pending or after a short delay.
+    """
+    global _flush_timer
+    with _db_lock:
+        rows = _pending_writes.setdefault(db_name, [])
+        rows.append((conversation_id, datetime.now(), query, response))
+        _track_new_row(db_name, conversation_id, query, response)
+
+        if len(rows) >= _FLUSH_BATCH_SIZE:
+            _flush_pending_writes(db_name)
+        elif _flush_timer is None:
+            _flush_timer = threading.Timer(_FLUSH_INTERVAL_SECONDS, _flush_pending_writes)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def add_chat_history_batch(db_name, interactions):
+    """
+    Writes several (conversation_id, query, response) interactions immediately, in a single
+    transaction. Useful for importing or replaying conversations in bulk.
+    """
+    rows = [(conversation_id, datetime.now(), query, response) for conversation_id, query, response in interactions]
     try:
-        with sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO chat_history (conversation_id, timestamp, query, response) VALUES (?, ?, ?, ?)",
-                (conversation_id, datetime.now(), query, response)
-            )
-            conn.commit()
+        with chat_history_transaction(db_name) as conn:
+            conn.executemany(_SQL_INSERT_MESSAGE, rows)
+            for conversation_id, query, response in interactions:
+                _track_new_row(db_name, conversation_id, query, response)
+        with _db_lock:
+            _count_rows_written(db_name, _get_conn(db_name), len(rows))
     except sqlite3.Error as e:
         print(f"Error adding to chat history: {e}")
 
 
 def get_conversations(db_name):
     """Retrieves a list of unique conversation IDs and their first query as the title."""
-    try:
-        with sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
-            cursor = conn.cursor()
-            # Use a subquery to get the first message for each conversation
-            cursor.execute("""
-                SELECT T1.conversation_id, T1.query
-                FROM chat_history T1
-                JOIN (
-                    SELECT conversation_id, MIN(timestamp) AS min_ts
-                    FROM chat_history
-                    GROUP BY conversation_id
-                ) T2 ON T1.conversation_id = T2.conversation_id AND T1.timestamp = T2.min_ts
-                ORDER BY T1.timestamp DESC;
-            """)
-            return cursor.fetchall()
-    except sqlite3.Error as e:
-        print(f"Error fetching conversations: {e}")
-        return []
+    with _db_lock:
+        if db_name in _conversations_cache:
+            return _conversations_cache[db_name]
+
+        try:
+            _flush_pending_writes(db_name)
+            cursor = _get_read_conn(db_name).execute(_SQL_SELECT_CONVERSATIONS, (_CONVERSATION_LIST_LIMIT,))
+            conversations = cursor.fetchall()
+            _conversations_cache[db_name] = conversations
+            return conversations
+        except sqlite3.Error as e:
+            print(f"Error fetching conversations: {e}")
+            return []
 
 
 def delete_conversation_from_db(db_name, conversation_id):
     """Deletes all messages for a given conversation_id from the database."""
     try:
-        with sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "DELETE FROM chat_history WHERE conversation_id = ?",
-                (conversation_id,)
-            )
-            conn.commit()
+        with chat_history_transaction(db_name) as conn:
+            conn.execute(_SQL_DELETE_CONVERSATION, (conversation_id,))
+            conn.execute(_SQL_DELETE_SUMMARY, (conversation_id,))
+            _invalidate_conversations_cache(db_name)
+            _history_cache.pop(conversation_id, None)
+        _drop_chat_session(conversation_id)
         print(f"Deleted conversation: {conversation_id}")
         return True
     except sqlite3.Error as e:
@@ -98,19 +366,41 @@ def delete_conversation_from_db(db_name, conversation_id):
         return False
 
 
+def iter_conversation_from_db(db_name, conversation_id):
+    """Yields the (query, response) rows of a past conversation, fetching them in batches."""
+    try:
+        _flush_pending_writes(db_name)
+        cursor = _get_read_conn(db_name).execute(_SQL_SELECT_CONVERSATION, (conversation_id,))
+        while rows := cursor.fetchmany(_FETCH_BATCH_SIZE):
+            yield from rows
+    except sqlite3.Error as e:
+        print(f"Error loading conversation: {e}")
+
+
 def load_conversation_from_db(db_name, conversation_id):
     """Loads a past conversation from the database."""
+    return list(iter_conversation_from_db(db_name, conversation_id))
+
+
+def get_conversation_summary(db_name, conversation_id, message_count):
+    """Returns the stored summary of a conversation's first message_count messages, if any."""
     try:
-        with sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT query, response FROM chat_history WHERE conversation_id = ? ORDER BY timestamp ASC",
-                (conversation_id,)
-            )
-            return cursor.fetchall()
+        row = _get_read_conn(db_name).execute(_SQL_SELECT_SUMMARY, (conversation_id, message_count)).fetchone()
+        return row[0] if row else None
     except sqlite3.Error as e:
-        print(f"Error loading conversation: {e}")
-        return []
+        print(f"Error loading conversation summary: {e}")
+        return None
+
+
+def save_conversation_summary(db_name, conversation_id, message_count, summary):
+    """Stores the summary of a conversation's first message_count messages, replacing any older one."""
+    try:
+        with _db_lock:
+            conn = _get_conn(db_name)
+            with conn:
+                conn.execute(_SQL_UPSERT_SUMMARY, (conversation_id, message_count, summary))
+    except sqlite3.Error as e:
+        print(f"Error saving conversation summary: {e}")
 
 
 def generate_report(conversation_id, db_name):
@@ -119,36 +409,94 @@ def generate_report(conversation_id, db_name):
     if not conversation_id:
         return gr_update(value=None, visible=False)
 
-    history = load_conversation_from_db(db_name, conversation_id)
-    if not history:
-        return gr_update(value=None, visible=False)
-
-    # Create the report content
-    report_content = f"# Impact Analysis Report\n\n"
-    report_content += f"**Conversation ID:** `{conversation_id}`\n"
-    report_content += f"**Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    report_content += "---\n\n"
-
-    all_sources = set()
+    # Create the report content as a list of parts, written out in one pass.
+    # Rows are streamed from the database rather than loaded into a list first.
+    report_parts = [
+        f"# Impact Analysis Report\n\n"
+        f"**Conversation ID:** `{conversation_id}`\n"
+        f"**Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        "---\n\n"
+    ]
+
+    for i, (query, response) in enumerate(iter_conversation_from_db(db_name, conversation_id)):
+        report_parts.append(
+            f"### Interaction {i+1}\n\n"
+            f"**User Query:**\n```\n{query}\n```\n\n"
+            f"**Aurora's Response:**\n{response}\n\n"
+            "---\n\n"
+        )
 
-    for i, (query, response) in enumerate(history):
-        report_content += f"### Interaction {i+1}\n\n"
-        report_content += f"**User Query:**\n```\n{query}\n```\n\n"
-        report_content += f"**Aurora's Response:**\n{response}\n\n"
-        
-        # Extract sources from the response
-        if "**Sources:**" in response:
-            sources_part = response.split("**Sources:**")[1]
-            sources = [line.split('`')[1] for line in sources_part.strip().split('\n') if '`' in line]
-            all_sources.update(sources)
-        report_content += "---\n\n"
+    if len(report_parts) == 1:
+        # No history was found, or there was a DB error
+        return gr_update(value=None, visible=False)
 
     # Create a temporary file to store the report
     with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.md', encoding='utf-8') as temp_file:
-        temp_file.write(report_content)
+        temp_file.writelines(report_parts)
         return gr_update(value=temp_file.name, visible=True)
 
 
+# Characters that are not valid in Mermaid node IDs, mapped to underscores
+_MERMAID_ID_TRANSLATION = str.maketrans({'.': '_', '-': '_'})
+
+# Parsed knowledge graphs with their lookup structures, keyed by file path: (mtime, graph index)
+_knowledge_graph_cache = {}
+
+
+def _load_knowledge_graph(graph_file_path):
+    """
+    Returns the knowledge graph's edges as (source, target, type) tuples and its node IDs,
+    along with lookup structures built from them: a matcher for finding node IDs in text
+    (None without pyahocorasick), and the positions of each node's outgoing and incoming
+    edges. The file is only parsed again when it changes.
+    """
+    mtime = os.stat(graph_file_path).st_mtime_ns
+    cached = _knowledge_graph_cache.get(graph_file_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    if orjson is not None:
+        with open(graph_file_path, 'rb') as f:
+            knowledge_graph = orjson.loads(f.read())
+    else:
+        with open(graph_file_path, 'r', encoding='utf-8') as f:
+            knowledge_graph = json.load(f)
+    # Keep only what visualization needs, in compact form, rather than the parsed dicts
+    node_ids = {node['id'] for node in knowledge_graph['nodes']}
+    edges = [(edge['source'], edge['target'], edge['type']) for edge in knowledge_graph['edges']]
+    del knowledge_graph
+
+    matcher = None
+    if ahocorasick is not None and node_ids:
+        matcher = ahocorasick.Automaton()
+        for node_id in node_ids:
+            matcher.add_word(node_id, node_id)
+        matcher.make_automaton()
+
+    # Edges are referenced by position so subgraphs can list them in file order
+    out_edges, in_edges = defaultdict(list), defaultdict(list)
+    for i, (source, target, _) in enumerate(edges):
+        out_edges[source].append(i)
+        in_edges[target].append(i)
+
+    graph_index = {
+        "edges": edges,
+        "node_ids": node_ids,
+        "matcher": matcher,
+        "out_edges": dict(out_edges),
+        "in_edges": dict(in_edges),
+    }
+    _knowledge_graph_cache[graph_file_path] = (mtime, graph_index)
+    return graph_index
+
+
+def _find_mentioned_nodes(text, node_ids, matcher):
+    """Returns the node IDs that occur anywhere in the text."""
+    if matcher is not None:
+        return {node_id for _, node_id in matcher.iter(text)}
+    return {node_id for node_id in node_ids if node_id in text}
+
+
 def generate_visualization(conversation_id, db_name, config, show_neighbors=False):
     """
     Generates a Mermaid diagram by filtering the knowledge graph based on the current conversation.
@@ -160,71 +508,372 @@ def generate_visualization(conversation_id, db_name, config, show_neighbors=Fals
     graph_file_path = config.get("knowledge_graph", {}).get("graph_file_path")
     if not graph_file_path or not os.path.exists(graph_file_path):
         return "```mermaid\ngraph TD;\n  A[Knowledge graph not found. Please build it on the Ingest page.];\n```"
-    
-    with open(graph_file_path, 'r', encoding='utf-8') as f:
-        knowledge_graph = json.load(f)
+
+    graph_index = _load_knowledge_graph(graph_file_path)
+    edges, out_edges, in_edges = graph_index["edges"], graph_index["out_edges"], graph_index["in_edges"]
 
     # 2. Identify relevant entities from the chat conversation
-    history = load_conversation_from_db(db_name, conversation_id)
-    if not history:
+    all_text = "".join(chain.from_iterable(iter_conversation_from_db(db_name, conversation_id)))
+    if not all_text:
         return "```mermaid\ngraph TD;\n  A[Could not load conversation history.];\n```"
 
-    all_text = "".join([q + r for q, r in history])
-    all_node_ids = {node['id'] for node in knowledge_graph['nodes']}
-    
     # Find nodes mentioned in the conversation
-    mentioned_nodes = {node_id for node_id in all_node_ids if node_id in all_text}
+    mentioned_nodes = _find_mentioned_nodes(all_text, graph_index["node_ids"], graph_index["matcher"])
 
     if not mentioned_nodes:
         return "```mermaid\ngraph TD;\n  A[No specific code entities found in this conversation to visualize.];\n```"
 
     # 3. Build the subgraph based on whether to include neighbors
+    # Only the edges touching mentioned nodes are visited, via the adjacency lists
     if show_neighbors:
         # Expanded view: include mentioned nodes and their direct neighbors
+        edge_positions = set()
+        for node_id in mentioned_nodes:
+            edge_positions.update(out_edges.get(node_id, ()))
+            edge_positions.update(in_edges.get(node_id, ()))
+        subgraph_edges = [edges[i] for i in sorted(edge_positions)]
         subgraph_nodes = set(mentioned_nodes)
-        subgraph_edges = []
-        for edge in knowledge_graph['edges']:
-            source, target = edge['source'], edge['target']
-            if source in mentioned_nodes or target in mentioned_nodes:
-                subgraph_nodes.add(source)
-                subgraph_nodes.add(target)
-                subgraph_edges.append(edge)
+        subgraph_nodes.update(node for source, target, _ in subgraph_edges for node in (source, target))
     else:
         # Focused view: include only edges between mentioned nodes.
-        subgraph_nodes = set(mentioned_nodes)
-        subgraph_edges = [
-            edge for edge in knowledge_graph['edges']
-            if edge['source'] in subgraph_nodes and edge['target'] in subgraph_nodes
+        edge_positions = [
+            i for node_id in mentioned_nodes for i in out_edges.get(node_id, ())
+            if edges[i][1] in mentioned_nodes
         ]
+        subgraph_edges = [edges[i] for i in sorted(edge_positions)]
         # The nodes for the subgraph are only those that are part of the filtered edges.
-        subgraph_nodes = {node for edge in subgraph_edges for node in (edge['source'], edge['target'])}
+        subgraph_nodes = {node for source, target, _ in subgraph_edges for node in (source, target)}
 
-    # 4. Convert the subgraph to Mermaid syntax
-    mermaid_string = "graph TD;\n"
+    # 4. Convert the subgraph to Mermaid syntax, collecting lines and joining once
+    mermaid_lines = ["```mermaid", "graph TD;"]
     # Create safe IDs for mermaid (replace dots, etc.)
-    safe_ids = {node_id: node_id.replace('.', '_').replace('-', '_') for node_id in subgraph_nodes}
+    safe_ids = {node_id: node_id.translate(_MERMAID_ID_TRANSLATION) for node_id in subgraph_nodes}
 
-    for node_id in sorted(list(subgraph_nodes)):
+    for node_id in sorted(subgraph_nodes):
         # Highlight the nodes that were directly mentioned in the chat
         if node_id in mentioned_nodes:
-            mermaid_string += f'  {safe_ids[node_id]}["`{node_id}`"];\n'
-            mermaid_string += f'  style {safe_ids[node_id]} fill:#0b5394,stroke:#fff,stroke-width:2px,color:#fff;\n'
+            mermaid_lines.append(f'  {safe_ids[node_id]}["`{node_id}`"];')
+            mermaid_lines.append(f'  style {safe_ids[node_id]} fill:#0b5394,stroke:#fff,stroke-width:2px,color:#fff;')
         else:
-            mermaid_string += f'  {safe_ids[node_id]}["{node_id}"];\n'
+            mermaid_lines.append(f'  {safe_ids[node_id]}["{node_id}"];')
 
-    for edge in subgraph_edges:
-        source, target = edge['source'], edge['target']
+    for source, target, edge_type in subgraph_edges:
         if source in safe_ids and target in safe_ids:
-            mermaid_string += f"  {safe_ids[source]} -->|{edge['type']}| {safe_ids[target]};\n"
+            mermaid_lines.append(f"  {safe_ids[source]} -->|{edge_type}| {safe_ids[target]};")
+
+    mermaid_lines.extend(["", "```"])
+    return "\n".join(mermaid_lines)
+
+# --- History Compression ---
+def _compress_history(client, conversation_id, gemini_history, prompts, config):
+    """
+    Keeps the most recent messages of a long conversation verbatim and replaces the older
+    ones with a summary, so the prompt stays bounded however long the conversation gets.
+    """
+    compression_config = config.get("history_compression", {})
+    if not compression_config.get("enabled", False) or len(gemini_history) <= compression_config.get("max_messages", 12):
+        return gemini_history
+
+    recent_count = compression_config.get("recent_messages", 6)
+    older, recent = gemini_history[:-recent_count], gemini_history[-recent_count:]
+
+    # Summaries are stored, so reloading the conversation doesn't summarize it again
+    db_name = config["database_name"]
+    summary = get_conversation_summary(db_name, conversation_id, len(older)) if conversation_id else None
+    if summary is None:
+        transcript = "\n\n".join(
+            f"{content.role}: {part.text}" for content in older for part in content.parts if part.text
+        )
+        try:
+            response = client.models.generate_content(
+                model=config["gemini_model"].get("summary_model_name", config["gemini_model"]["chat_model_name"]),
+                contents=transcript,
+                config=types.GenerateContentConfig(system_instruction=prompts.get("history_summary_prompt"))
+            )
+            summary = response.text
+        except Exception as e:
+            print(f"Error summarizing conversation history: {e}")
+            return gemini_history
+        if not summary:
+            return gemini_history
+        if conversation_id:
+            save_conversation_summary(db_name, conversation_id, len(older), summary)
+
+    return [
+        types.Content(role="user", parts=[types.Part(text=f"Summary of our conversation so far:\n{summary}")]),
+        types.Content(role="model", parts=[types.Part(text="Understood. I'll keep this context in mind.")]),
+        *recent
+    ]
+
+
+# --- Gemini Context Caching ---
+# Context caches holding a resumed conversation's prefix: conversation_id -> (cache name, history digest)
+_context_caches = {}
+
+
+def _history_digest(gemini_history):
+    """
+    Returns a digest of the history's roles and text. Compressed histories all have the same
+    length, so the contents, not the message count, tell whether a cache is still current.
+    """
+    digest = hashlib.sha256()
+    for content in gemini_history:
+        digest.update(f"{content.role}\0".encode("utf-8"))
+        for part in content.parts:
+            digest.update((part.text or "").encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def _get_context_cache(client, conversation_id, gemini_history, tools, system_instruction, config):
+    """
+    Returns the name of a Gemini context cache holding the system instruction, tools, and
+    conversation history, creating or refreshing it as needed. Returns None if the history
+    is too short to be worth caching or caching is unavailable.
+    """
+    cache_config = config.get("context_cache", {})
+    if not cache_config.get("enabled", False) or not conversation_id or not gemini_history:
+        return None
+
+    # Gemini only caches prompts above a minimum size, so skip short conversations
+    history_chars = sum(len(part.text or "") for content in gemini_history for part in content.parts)
+    if history_chars < cache_config.get("min_history_chars", 4096):
+        return None
+
+    ttl = f"{cache_config.get('ttl_seconds', 3600)}s"
+    history_digest = _history_digest(gemini_history)
+    cached = _context_caches.get(conversation_id)
+    if cached and cached[1] == history_digest:
+        try:
+            client.caches.update(name=cached[0], config=types.UpdateCachedContentConfig(ttl=ttl))
+            return cached[0]
+        except Exception as e:
+            print(f"Context cache for {conversation_id} expired, recreating it: {e}")
+    elif cached:
+        # The conversation has moved on since the cache was created
+        _drop_context_cache(client, conversation_id)
+
+    try:
+        cache = client.caches.create(
+            model=config["gemini_model"]["chat_model_name"],
+            config=types.CreateCachedContentConfig(
+                contents=gemini_history,
+                system_instruction=system_instruction,
+                tools=tools,
+                ttl=ttl
+            )
+        )
+    except Exception as e:
+        print(f"Could not create context cache for {conversation_id}: {e}")
+        return None
+
+    _context_caches[conversation_id] = (cache.name, history_digest)
+    return cache.name
+
+
+def _drop_context_cache(client, conversation_id):
+    """Deletes a conversation's context cache, if it has one."""
+    cached = _context_caches.pop(conversation_id, None)
+    if cached and client is not None:
+        try:
+            client.caches.delete(name=cached[0])
+        except Exception as e:
+            # The cache may already have expired
+            print(f"Could not delete context cache for {conversation_id}: {e}")
+
+
+def _refresh_context_cache(client, cache_name, config):
+    """Extends a context cache's TTL for a session that reads from it. Returns False if the cache is gone."""
+    ttl = f"{config.get('context_cache', {}).get('ttl_seconds', 3600)}s"
+    try:
+        client.caches.update(name=cache_name, config=types.UpdateCachedContentConfig(ttl=ttl))
+        return True
+    except Exception as e:
+        print(f"Could not refresh context cache {cache_name}: {e}")
+        return False
+
+
+# The context cache holding the system instruction and tools shared by new conversations,
+# as (key, cache name or None if caching failed, monotonic expiry time)
+_system_prompt_cache = None
+_system_prompt_cache_lock = threading.Lock()
+
+
+def _get_system_prompt_cache(client, tools, system_instruction, config):
+    """
+    Returns the name of a Gemini context cache holding the system instruction and tools,
+    shared by every new conversation. Returns None if the instruction is too short to be
+    worth caching or caching is unavailable.
+    """
+    global _system_prompt_cache
+    cache_config = config.get("context_cache", {})
+    if not cache_config.get("enabled", False) or not system_instruction:
+        return None
+    if len(system_instruction) < cache_config.get("min_system_prompt_chars", 4096):
+        return None
+
+    model = config["gemini_model"]["chat_model_name"]
+    store_names = tuple(name for tool in tools for name in tool.file_search.file_search_store_names)
+    key = (model, system_instruction, store_names)
+    ttl_seconds = cache_config.get("ttl_seconds", 3600)
+    ttl = f"{ttl_seconds}s"
+
+    with _system_prompt_cache_lock:
+        cached = _system_prompt_cache
+        now = time.monotonic()
+        if cached and cached[0] == key and not (cached[1] is None and now >= cached[2]):
+            # Extend the cache's lifetime once it is past halfway rather than on every use.
+            # A failed attempt is remembered for the same period so it isn't retried per session.
+            if cached[1] is None or now < cached[2] - ttl_seconds / 2:
+                return cached[1]
+            try:
+                client.caches.update(name=cached[1], config=types.UpdateCachedContentConfig(ttl=ttl))
+                _system_prompt_cache = (key, cached[1], time.monotonic() + ttl_seconds)
+                return cached[1]
+            except Exception as e:
+                print(f"System prompt cache expired, recreating it: {e}")
+
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(system_instruction=system_instruction, tools=tools, ttl=ttl)
+            )
+            _system_prompt_cache = (key, cache.name, time.monotonic() + ttl_seconds)
+            return cache.name
+        except Exception as e:
+            print(f"Could not create system prompt cache: {e}")
+            _system_prompt_cache = (key, None, time.monotonic() + ttl_seconds)
+            return None
+
+
+def _refresh_system_prompt_cache(client, cache_name, config):
+    """
+    Extends the shared system prompt cache's TTL for a session that reads from it, once it is
+    past halfway. Returns False if the cache is gone, and forgets it so new sessions replace it.
+    """
+    global _system_prompt_cache
+    ttl_seconds = config.get("context_cache", {}).get("ttl_seconds", 3600)
+    with _system_prompt_cache_lock:
+        cached = _system_prompt_cache
+        current = cached is not None and cached[1] == cache_name
+        if current and time.monotonic() < cached[2] - ttl_seconds / 2:
+            return True
+        if not _refresh_context_cache(client, cache_name, config):
+            if current:
+                _system_prompt_cache = None
+            return False
+        if current:
+            _system_prompt_cache = (cached[0], cache_name, time.monotonic() + ttl_seconds)
+        return True
+
+
+def _refresh_session_cache(client, conversation_id, cache_name, config):
+    """Extends the TTL of the context cache a reused session reads from. Returns False if the cache is gone."""
+    cached = _context_caches.get(conversation_id)
+    if cached and cached[0] == cache_name:
+        return _refresh_context_cache(client, cache_name, config)
+    return _refresh_system_prompt_cache(client, cache_name, config)
+
+
+def _drop_session_cache(client, conversation_id, cache_name):
+    """Stops new sessions from using a context cache that a session failed to read from."""
+    global _system_prompt_cache
+    cached = _context_caches.get(conversation_id)
+    if cached and cached[0] == cache_name:
+        _drop_context_cache(client, conversation_id)
+        return
+    # The shared cache is only forgotten, not deleted, since other sessions may still read from it
+    with _system_prompt_cache_lock:
+        if _system_prompt_cache is not None and _system_prompt_cache[1] == cache_name:
+            _system_prompt_cache = None
 
-    return f"```mermaid\n{mermaid_string}\n```"
 
 # --- Core Chat Logic ---
-def chat_fn(message, history, chat_session, conversation_id_state, client, store, prompts, config):
+def _session_history(conversation_id, history, client, prompts, config):
+    """Returns the Gemini history a new chat session for the conversation starts from."""
+    # Reuse the history prepared when the conversation was loaded, if available.
+    # Otherwise convert Gradio's ChatMessage history to Gemini's Content format.
+    with _db_lock:
+        gemini_history = _history_cache.get(conversation_id)
+        if gemini_history is not None:
+            _history_cache.move_to_end(conversation_id)
+    if gemini_history is None:
+        gemini_history = []
+        # chat_wrapper has already appended the message being sent; it goes out separately,
+        # so it must not also be replayed as history
+        for msg in (history or [])[:-1]:
+            # The Gemini API uses 'model' for the assistant's role
+            if isinstance(msg, dict):
+                role = 'model' if msg['role'] == 'assistant' else msg['role']
+                content = msg['content']
+            else:  # It's a ChatMessage object
+                role = 'model' if msg.role == 'assistant' else msg.role
+                content = msg.content
+            gemini_history.append(types.Content(role=role, parts=[types.Part(text=content)]))
+
+    # Summarize older turns of long conversations to bound the prompt size
+    return _compress_history(client, conversation_id, gemini_history, prompts, config)
+
+
+def _create_chat_session(client, store, conversation_id, gemini_history, prompts, config, use_cache=True):
+    """
+    Creates a chat session that continues gemini_history. Returns the session and the name of
+    the context cache it reads from (the conversation's own or the shared system prompt cache),
+    or None if everything was sent inline.
+    """
+    # Configure the tools for the chat session
+    tools = [
+        types.Tool(
+            file_search=types.FileSearch(
+                file_search_store_names=[store.name]
+            )
+        )
+    ]
+    system_instruction = prompts.get("chat_prompt")
+
+    # When resuming a long conversation, serve its prefix from Gemini's context cache
+    cache_name = None
+    if use_cache:
+        cache_name = _get_context_cache(client, conversation_id, gemini_history, tools, system_instruction, config)
+    if use_cache and not cache_name and not gemini_history:
+        # A new conversation can share the cached system instruction and tools
+        cache_name = _get_system_prompt_cache(client, tools, system_instruction, config)
+    if cache_name:
+        # The cache already holds the system instruction, tools, and any history
+        chat_session = client.chats.create(  # type: ignore
+            model=config["gemini_model"]["chat_model_name"],
+            config=types.GenerateContentConfig(cached_content=cache_name)
+        )
+    else:
+        # Start a chat session with the tool config
+        tool_config = types.GenerateContentConfig(tools=tools, system_instruction=system_instruction)
+        chat_session = client.chats.create(  # type: ignore
+            history=gemini_history,
+            model=config["gemini_model"]["chat_model_name"],
+            config=tool_config
+        )
+    return chat_session, cache_name
+
+
+def chat_fn(message, history, chat_session, conversation_id_state, client, store, prompts, config, extra_instruction=None):
     """
     Handles the chat interaction, using the file search store as a tool.
+    An extra instruction, if given, is sent as its own part after the message.
+    Yields the response text as it is streamed, with citations added to the final update.
     """
     db_name = config["database_name"]
+
+    # Reject oversized messages before they reach the paid API
+    max_message_chars = config["gemini_model"].get("max_message_chars")
+    if max_message_chars and len(message) > max_message_chars:
+        yield (
+            f"Your message is too long ({len(message)} characters). "
+            f"Please shorten it to at most {max_message_chars} characters.",
+            chat_session, conversation_id_state, False
+        )
+        return
+
+    # Answers that followed an extra instruction are cached separately from plain ones
+    cache_key = f"{message}\n\n{extra_instruction}" if extra_instruction else message
     new_conversation_started = False
 
     # If conversation_id is missing, it's a new conversation.
@@ -234,71 +883,94 @@ def chat_fn(message, history, chat_session, conversation_id_state, client, store
         conversation_id_state = f"conv_{datetime.now().strftime('%Y%m%d%H%M%S')}"
         print(f"New conversation started with ID: {conversation_id_state}")
 
+    # Answer repeated opening questions from the semantic cache. Follow-up turns depend on
+    # the conversation's context, so only the first message of a conversation is eligible.
+    semantic_cache = get_semantic_cache(client, config) if new_conversation_started else None
+    if semantic_cache:
+        cached_response = semantic_cache.get(cache_key)
+        if cached_response:
+            print(f"Semantic cache hit for conversation: {conversation_id_state}")
+            add_chat_history(db_name, conversation_id_state, message, cached_response)
+            yield cached_response, chat_session, conversation_id_state, new_conversation_started
+            return
+
+    # After loading a conversation, continue its session if it is still live
+    cache_name = None
+    if not new_conversation_started:
+        max_age_seconds = config.get("context_cache", {}).get("ttl_seconds", 3600)
+        registered_session, registered_cache_name = _get_chat_session(conversation_id_state, max_age_seconds)
+        if not chat_session:
+            chat_session = registered_session
+        if chat_session is registered_session:
+            cache_name = registered_cache_name
+
+    # A reused session reads its history from a context cache, which must outlive this turn
+    if chat_session and cache_name and not _refresh_session_cache(client, conversation_id_state, cache_name, config):
+        _drop_session_cache(client, conversation_id_state, cache_name)
+        chat_session = None
+
     # If the backend chat session doesn't exist (e.g., after loading a convo), create it.
     if not chat_session:
-        chat_session = None  # Ensure any previous session object is discarded
-
-        # Convert Gradio's ChatMessage history to Gemini's Content format before creating the session
-        gemini_history = []
-        if history:
-            for msg in history:
-                # The Gemini API uses 'model' for the assistant's role
-                if isinstance(msg, dict):
-                    role = 'model' if msg['role'] == 'assistant' else msg['role']
-                    content = msg['content']
-                else:  # It's a ChatMessage object
-                    role = 'model' if msg.role == 'assistant' else msg.role
-                    content = msg.content
-                gemini_history.append(types.Content(role=role, parts=[types.Part(text=content)]))
-
-        # Configure the tools for the chat session
-        tool_config = types.GenerateContentConfig(
-            tools=[
-                types.Tool(
-                    file_search=types.FileSearch(
-                        file_search_store_names=[store.name]
-                    )
+        gemini_history = _session_history(conversation_id_state, history, client, prompts, config)
+        chat_session, cache_name = _create_chat_session(client, store, conversation_id_state, gemini_history, prompts, config)
+        _register_chat_session(conversation_id_state, chat_session, cache_name)
+
+    # Send the user's message to the existing chat session and stream the response.
+    # The message leads unchanged, so the prompt prefix matches the model's cache across turns.
+    parts = [types.Part(text=message)]
+    if extra_instruction:
+        parts.append(types.Part(text=extra_instruction))
+    response_text = ""
+    grounding = None
+    while True:
+        try:
+            for chunk in chat_session.send_message_stream(parts):
+                # Grounding metadata is nested in the first candidate and arrives with the final chunks
+                if chunk.candidates and chunk.candidates[0].grounding_metadata:
+                    grounding = chunk.candidates[0].grounding_metadata
+                if chunk.text:
+                    response_text += chunk.text
+                    yield response_text, chat_session, conversation_id_state, new_conversation_started
+            break
+        except Exception as e:
+            print(f"Error during chat session: {e}")
+            if cache_name and not response_text:
+                # The session's context cache has most likely expired, which fails every later
+                # send too. Rebuild the session with its history inline and try once more.
+                _drop_session_cache(client, conversation_id_state, cache_name)
+                gemini_history = _session_history(conversation_id_state, history, client, prompts, config)
+                chat_session, cache_name = _create_chat_session(
+                    client, store, conversation_id_state, gemini_history, prompts, config, use_cache=False
                 )
-            ],
-            system_instruction=prompts.get("chat_prompt")
-        )
-        # Start a chat session with the tool config
-        chat_session = client.chats.create(  # type: ignore
-            history=gemini_history,
-            model=config["gemini_model"]["chat_model_name"],
-            config=tool_config
-        )
-
-    # Send the user's message to the existing chat session
-    try:
-        response = chat_session.send_message(message)
-        response_text = response.text
-    except Exception as e:
-        print(f"Error during chat session: {e}")
-        error_message = (
-            "I'm sorry, but I encountered an error while processing your request. "
-            "This could be due to a temporary issue with the service. Please try again in a moment."
+                _register_chat_session(conversation_id_state, chat_session, cache_name)
+                continue
+            # Don't hand a failed session out again, from the registry or from the UI state
+            _drop_chat_session(conversation_id_state)
+            error_message = (
+                "I'm sorry, but I encountered an error while processing your request. "
+                "This could be due to a temporary issue with the service. Please try again in a moment."
+            )
+            yield error_message, None, conversation_id_state, new_conversation_started
+            return
+
+    # Add citations from grounding metadata, listing each source once in retrieval order
+    if grounding and grounding.grounding_chunks:
+        sources = dict.fromkeys(
+            chunk.retrieved_context.title
+            for chunk in grounding.grounding_chunks
+            if chunk.retrieved_context and chunk.retrieved_context.title
         )
-        return error_message, chat_session, conversation_id_state, new_conversation_started
-
-    # Add citations from grounding metadata
-    try:
-        # Grounding metadata is nested in the first candidate
-        grounding = response.candidates[0].grounding_metadata
-        if grounding and grounding.grounding_chunks:
-            sources = {chunk.retrieved_context.title for chunk in grounding.grounding_chunks}
-            if sources:
-                citations = "\n\n**Sources:**\n" + "\n".join(f"- `{source}`" for source in sorted(list(sources)))
-                response_text += citations
-    except (AttributeError, IndexError):
-        # This can happen if there are no candidates or no grounding metadata.
-        pass
+        if sources:
+            response_text += "\n\n**Sources:**\n" + "\n".join(f"- `{source}`" for source in sources)
 
     # Save the interaction to the database
     if message and response_text and conversation_id_state:
         add_chat_history(db_name, conversation_id_state, message, response_text)
 
-    return response_text, chat_session, conversation_id_state, new_conversation_started
+    if semantic_cache and response_text:
+        semantic_cache.put(cache_key, response_text)
+
+    yield response_text, chat_session, conversation_id_state, new_conversation_started
 
 
 def _get_conversation_controls_updates(visible: bool, report_file_value=None):
@@ -330,9 +1002,11 @@ def load_conversation(conversation_id, db_name):
     for query, response in history:
         chat_history_formatted.extend([ChatMessage(role="user", content=query), ChatMessage(role="assistant", content=response)])
 
-    # When loading a conversation, we must start a new backend chat session
-    # because the session object cannot be serialized and stored.
-    # The context is rebuilt by Gradio's history.
+    # The session object cannot be serialized into Gradio state, so chat_fn looks it up
+    # by conversation ID. In case it has been evicted, prepare the Gemini history now
+    # so a new session can be created without rebuilding it.
+    with _db_lock:
+        _cache_history(conversation_id, _to_gemini_history(history))
     return chat_history_formatted, None, conversation_id, gr_update(value=conversation_id), *_get_conversation_controls_updates(True)
 
 
@@ -340,35 +1014,49 @@ def load_conversation(conversation_id, db_name):
 def chat_wrapper(message, history, assess_criticality, chat_session, conversation_id_state, client, store, prompts, config, refresh_conversation_list_fn):
     """
     Wrapper function to manage history for the custom chat UI.
-    It calls the main chat_fn and handles history updates.
+    It calls the main chat_fn and streams history updates as the response arrives.
     """
+    # Ignore empty submissions (e.g. a stray Enter) without calling the model or the database
+    if not (message and message.strip()):
+        yield history, "", chat_session, conversation_id_state, gr.update()
+        return
+
     # Append the user's message to the history for display
     history.append(ChatMessage(role="user", content=message))
 
-    # If the user wants a criticality assessment, append the instruction to the message
-    final_message = message
-    if assess_criticality:
-        final_message += "\n\nPlease also provide a detailed criticality assessment for the identified impacts, prioritizing them from most to least critical."
-    
-    # Get the bot's response by calling the core chat logic
-    response_text, new_chat_session, new_conversation_id, new_convo_started = chat_fn(
-        final_message, history, chat_session, conversation_id_state, client, store, prompts, config
+    # If the user wants a criticality assessment, send the instruction alongside the message
+    extra_instruction = prompts.get("criticality_prompt") if assess_criticality else None
+
+    # Stream the bot's response from the core chat logic, updating the last history entry
+    response_updates = chat_fn(
+        message, history, chat_session, conversation_id_state, client, store, prompts, config, extra_instruction
     )
-    
-    # Append the bot's response to the history
-    history.append(ChatMessage(role="assistant", content=response_text))
-    
+    for i, (response_text, new_chat_session, new_conversation_id, new_convo_started) in enumerate(response_updates):
+        assistant_message = ChatMessage(role="assistant", content=response_text)
+        if i == 0:
+            history.append(assistant_message)
+        else:
+            history[-1] = assistant_message
+        yield history, "", new_chat_session, new_conversation_id, gr.update()
+
     # If a new conversation was started, refresh the list
-    conversation_list_update = refresh_conversation_list_fn() if new_convo_started else gr.update()
+    # refresh_conversation_list_fn() also returns the control updates; only the list update is needed here
+    conversation_list_update = refresh_conversation_list_fn()[0] if new_convo_started else gr.update()
 
     # Return all the updated states, clearing the input textbox
-    return history, "", new_chat_session, new_conversation_id, conversation_list_update
+    yield history, "", new_chat_session, new_conversation_id, conversation_list_update
 
 def get_formatted_conversations(db_name):
     """Fetches and formats conversations for the gr.Radio component."""
-    convos = get_conversations(db_name)
-    # Format for gr.Radio: list of (label, value) tuples
-    return [(f"{title[:40]}..." if len(title) > 40 else title, conv_id) for conv_id, title in convos]
+    with _db_lock:
+        if db_name in _formatted_conversations_cache:
+            return _formatted_conversations_cache[db_name]
+
+        convos = get_conversations(db_name)
+        # Format for gr.Radio: list of (label, value) tuples
+        formatted = [(f"{title[:40]}..." if len(title) > 40 else title, conv_id) for conv_id, title in convos]
+        _formatted_conversations_cache[db_name] = formatted
+        return formatted
 
 def create_chat_ui(client, store, prompts, config):
     """Creates the Gradio UI for the Chat tab."""
@@ -420,9 +1108,10 @@ def create_chat_ui(client, store, prompts, config):
         # --- Event Handlers ---
         refresh_fn = lambda: refresh_conversation_list(db_name)
         
-        chat_wrapper_fn = lambda msg, hist, crit, sess, conv_id: chat_wrapper(msg, hist, crit, sess, conv_id, client, store, prompts, config, refresh_fn)
-        send_button.click(fn=chat_wrapper_fn, inputs=[chat_input, chatbot, assess_criticality_checkbox, chat_session_state, conversation_id_state], outputs=[chatbot, chat_input, chat_session_state, conversation_id_state, conversation_list])
-        chat_input.submit(fn=chat_wrapper_fn, inputs=[chat_input, chatbot, assess_criticality_checkbox, chat_session_state, conversation_id_state], outputs=[chatbot, chat_input, chat_session_state, conversation_id_state, conversation_list])
+        chat_wrapper_fn = lambda msg, hist, crit, sess, conv_id: (yield from chat_wrapper(msg, hist, crit, sess, conv_id, client, store, prompts, config, refresh_fn))
+        chat_concurrency_limit = config.get("server", {}).get("chat_concurrency_limit", 8)
+        send_button.click(fn=chat_wrapper_fn, inputs=[chat_input, chatbot, assess_criticality_checkbox, chat_session_state, conversation_id_state], outputs=[chatbot, chat_input, chat_session_state, conversation_id_state, conversation_list], concurrency_limit=chat_concurrency_limit)
+        chat_input.submit(fn=chat_wrapper_fn, inputs=[chat_input, chatbot, assess_criticality_checkbox, chat_session_state, conversation_id_state], outputs=[chatbot, chat_input, chat_session_state, conversation_id_state, conversation_list], concurrency_limit=chat_concurrency_limit)
 
         chatbot.example_select(fn=populate_example, inputs=None, outputs=[chat_input])
 
@@ -443,7 +1132,7 @@ def create_chat_ui(client, store, prompts, config):
             show_progress="hidden"
         )
 
-        delete_conversation_fn = lambda conv_id: delete_conversation(conv_id, db_name, refresh_fn)
+        delete_conversation_fn = lambda conv_id: delete_conversation(conv_id, db_name, refresh_fn, client)
         delete_conversation_button.click(
             fn=delete_conversation_fn,
             inputs=[conversation_id_state],
@@ -469,7 +1158,7 @@ def refresh_conversation_list(db_name):
     formatted_convos = get_formatted_conversations(db_name)
     return gr.update(choices=formatted_convos), *_get_conversation_controls_updates(False)
 
-def delete_conversation(conversation_id, db_name, refresh_conversation_list_fn):
+def delete_conversation(conversation_id, db_name, refresh_conversation_list_fn, client=None):
     """Deletes a conversation and updates the UI."""
     if not conversation_id:
         return None, None, None, gr.update(), *_get_conversation_controls_updates(False)
@@ -480,6 +1169,8 @@ def delete_conversation(conversation_id, db_name, refresh_conversation_list_fn):
         # If deletion fails, don't change the UI, just log the error.
         return gr.update(), gr.update(), gr.update(), gr.update(), *_get_conversation_controls_updates(True)
 
+    _drop_context_cache(client, conversation_id)
+
     # After successful deletion, clear the chat, refresh the list, and hide the button
     # We call refresh_fn() which returns a tuple of updates for the list and controls.
     conversation_list_update, *control_updates = refresh_conversation_list_fn()
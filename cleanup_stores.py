@@ -1,7 +1,42 @@
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from google import genai
 
+from ingest import STORE_CACHE_PATH, MANIFEST_PATH
+
+def _delete_store(client, store):
+    """Force-deletes a single file search store, including its documents."""
+    client.file_search_stores.delete(name=store.name, config={'force': True})
+
+
+def _prune_local_state(deleted):
+    """
+    Forgets the deleted stores in the app's cached store names and ingestion manifest,
+    leaving entries for stores that could not be deleted in place.
+    """
+    try:
+        with open(STORE_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        remaining = {name: store for name, store in cache.items() if store not in deleted}
+        if remaining:
+            with open(STORE_CACHE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(remaining, f)
+        else:
+            os.remove(STORE_CACHE_PATH)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("store") in deleted:
+            os.remove(MANIFEST_PATH)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
 def cleanup_all_stores():
     """
     Connects to the Google AI API and deletes all file search stores after user confirmation.
@@ -32,14 +67,25 @@ def cleanup_all_stores():
             return
 
         print("\n--- Starting Deletion Process ---")
-        for store in stores:
-            try:
+        # Deletions are independent network calls, so run several at once
+        deleted = set()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = {}
+            for store in stores:
                 print(f"Deleting store: {store.display_name} ({store.name})...")
-                client.file_search_stores.delete(name=store.name, config={'force': True})
-                print(f"✅ Deleted successfully.")
-            except Exception as e:
-                print(f"❌ Failed to delete {store.display_name}: {e}")
-        
+                futures[executor.submit(_delete_store, client, store)] = store
+            for future in as_completed(futures):
+                store = futures[future]
+                try:
+                    future.result()
+                    deleted.add(store.name)
+                    print(f"✅ Deleted {store.display_name} ({store.name}).")
+                except Exception as e:
+                    print(f"❌ Failed to delete {store.display_name}: {e}")
+
+        # The app's cached store name and ingestion manifest may refer to deleted stores
+        _prune_local_state(deleted)
+
         print("\n--- Cleanup Complete ---")
 
     except Exception as e:
@@ -0,0 +1,83 @@
+import os
+import ast
+
+# Knowledge graph analysis, run in worker processes. Only the standard library is imported
+# here, so what workers load for the analysis itself stays small.
+
+
+# Node types that cannot contain a definition, import, or call, so their subtrees are skipped
+_AST_LEAF_TYPES = (ast.Name, ast.Constant, ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop, ast.alias)
+
+
+class CodeAnalyzer:
+    """
+    Extracts nodes (files, functions, classes) and edges (imports, calls) from Python code.
+    The AST is walked with an explicit stack rather than recursively, so deeply nested
+    (e.g. generated) code cannot exceed the recursion limit.
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.nodes = []
+        self.edges = []
+
+    def visit(self, tree):
+        """Walks the tree in source order, recording what it finds."""
+        # Each entry is a node and the scope (function, class, or file) it appears in
+        stack = [(tree, self.file_name)]
+        while stack:
+            node, scope = stack.pop()
+            node_type = type(node)
+            if node_type is ast.FunctionDef or node_type is ast.ClassDef:
+                kind = "function" if node_type is ast.FunctionDef else "class"
+                self.nodes.append({"id": node.name, "type": kind, "file": self.file_name})
+                scope = node.name
+            elif node_type is ast.Import:
+                for alias in node.names:
+                    self.edges.append({"source": self.file_name, "target": alias.name, "type": "imports"})
+            elif node_type is ast.ImportFrom:
+                if node.module:
+                    self.edges.append({"source": self.file_name, "target": node.module, "type": "imports"})
+            elif node_type is ast.Call:
+                # This is a simplified call analysis. It captures direct function names.
+                if isinstance(node.func, ast.Name):
+                    self.edges.append({"source": scope, "target": node.func.id, "type": "calls"})
+
+            children = []
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    children.extend(value)
+                elif isinstance(value, ast.AST):
+                    children.append(value)
+            # Pushed in reverse so children are visited in source order
+            for child in reversed(children):
+                if isinstance(child, ast.AST) and not isinstance(child, _AST_LEAF_TYPES):
+                    stack.append((child, scope))
+
+
+def analyze_file(file_path):
+    """
+    Reads and analyzes a Python file for the knowledge graph. Returns (nodes, edges, error):
+    nodes starts with the file itself, or is None if the file is empty, and error describes
+    why the file could not be analyzed. Runs in a worker process, so errors are returned
+    rather than raised.
+    """
+    file_name = os.path.basename(file_path)
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+    except Exception as e:
+        return [], [], str(e)
+
+    if not content.strip():
+        return None, [], None
+
+    # The file itself is a node even if it fails to parse
+    nodes = [{"id": file_name, "type": "file", "file": file_name}]
+    try:
+        tree = ast.parse(content)
+        analyzer = CodeAnalyzer(file_name)
+        analyzer.visit(tree)
+    except Exception as e:
+        return nodes, [], str(e)
+    return nodes + analyzer.nodes, analyzer.edges, None
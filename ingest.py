@@ -1,28 +1,303 @@
 import os
 import time
 import json
+import hashlib
 import gradio as gr
-import ast
+import random
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from google.genai import errors
+
+from cache import invalidate_semantic_cache
+from code_analysis import analyze_file
+
+try:
+    # Optional (installed with Gradio): reads and writes large knowledge graphs much faster than json
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Local file mapping store display names to resolved store names, so startup can skip
+# listing every store
+STORE_CACHE_PATH = ".aurora_store_cache.json"
+
+
+def _read_store_cache():
+    """Returns the cached {display_name: store_name} mapping, or an empty dict."""
+    try:
+        with open(STORE_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_store_cache(store_display_name, store_name):
+    """Persists the resolved store name for the next startup."""
+    cache = _read_store_cache()
+    cache[store_display_name] = store_name
+    try:
+        with open(STORE_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"Could not write store cache: {e}")
 
 
 def get_or_create_store(client, store_display_name):
     """Gets the file search store or creates it if it doesn't exist."""
     print(f"--- Initializing File Search Store: {store_display_name} ---")
 
+    # Try the store resolved on a previous run with a single lookup
+    cached_name = _read_store_cache().get(store_display_name)
+    if cached_name:
+        try:
+            store = client.file_search_stores.get(name=cached_name)
+            if store.display_name == store_display_name:
+                print(f"Found cached store: {store.name}")
+                return store
+        except Exception as e:
+            # The store may have been deleted; fall back to a full lookup
+            print(f"Cached store is no longer available: {e}")
+
     # Check if the store already exists
     for store in client.file_search_stores.list():
         if store.display_name == store_display_name:
             print(f"Found existing store: {store.name}")
+            _write_store_cache(store_display_name, store.name)
             return store
 
     # If not found, create a new one
     print(f"Store not found, creating a new one: {store_display_name}")
-    return client.file_search_stores.create(config={'display_name': store_display_name})
+    store = client.file_search_stores.create(config={'display_name': store_display_name})
+    _write_store_cache(store_display_name, store.name)
+    return store
+
+
+# Local file recording the size, mtime, and content digest of every file indexed into the store
+MANIFEST_PATH = ".aurora_manifest.json"
+
+
+def _load_manifest(store_name, chunking_config):
+    """
+    Returns [size, mtime_ns, digest, document_name] records of files already indexed into
+    the store, keyed by absolute path.
+    """
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Records made for another store say nothing about this one
+    if manifest.get("store") != store_name:
+        return {}
+    # Older manifests stored only the digest, or no document name; the stat check then
+    # fails once and is refreshed
+    files = {}
+    for path, record in manifest.get("files", {}).items():
+        record = record if isinstance(record, list) else [None, None, record]
+        files[path] = (record + [None] * 4)[:4]
+    # Files chunked differently must be uploaded again, but their documents are still
+    # known so they can be replaced
+    if manifest.get("chunking") != chunking_config:
+        files = {path: [None, None, None, record[3]] for path, record in files.items() if record[3]}
+    return files
+
+
+def _save_manifest(store_name, chunking_config, files):
+    """Atomically rewrites the manifest so an interrupted write never leaves it corrupt."""
+    temp_path = MANIFEST_PATH + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"store": store_name, "chunking": chunking_config, "files": files}, f)
+        os.replace(temp_path, MANIFEST_PATH)
+    except OSError as e:
+        print(f"Could not write ingestion manifest: {e}")
+
+
+def _file_digest(file_path):
+    """Returns the SHA-256 digest of a file's contents."""
+    with open(file_path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _call_with_retry(fn, max_retries, **kwargs):
+    """
+    Calls fn(**kwargs), retrying with exponential backoff and jitter while the API
+    responds with HTTP 429 (rate limit exceeded).
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(**kwargs)
+        except errors.APIError as e:
+            if e.code != 429 or attempt == max_retries:
+                raise
+            delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+            print(f"Rate limited, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+async def _delete_document(client, document_name, max_retries=5):
+    """
+    Deletes a document, with its chunks, from the file search store. Returns whether it
+    is gone; a failure only leaves a stale document behind, so it is reported, not raised.
+    """
+    try:
+        await asyncio.to_thread(
+            _call_with_retry,
+            client.file_search_stores.documents.delete,
+            max_retries,
+            name=document_name,
+            config={'force': True}
+        )
+        return True
+    except Exception as e:
+        print(f"Could not delete document {document_name}: {e}")
+        return False
+
+
+async def _upload_one(file_path, stat, client, store, mime_type_map, semaphore, indexed=None, max_retries=5, poll_initial=0.25, poll_max=8.0, chunking_config=None):
+    """
+    Uploads a single file to the file search store and waits until it is indexed, unless
+    indexed (the file's manifest record) shows it is unchanged. stat is the file's stat
+    result from the directory walk, or None to stat it here. Returns the file's new
+    manifest record and whether it was uploaded. The document a changed file was
+    previously indexed as is deleted once its replacement is indexed.
+    The SDK calls are blocking, so they run in worker threads; waiting between polls does not
+    occupy a thread.
+    """
+    async with semaphore:
+        file_name = os.path.basename(file_path)
+        # Matching size and mtime mean the file is unchanged, without reading it
+        if stat is None:
+            stat = await asyncio.to_thread(os.stat, file_path)
+        if indexed and indexed[0] == stat.st_size and indexed[1] == stat.st_mtime_ns:
+            return indexed, False
+
+        digest = await asyncio.to_thread(_file_digest, file_path)
+        previous_document = indexed[3] if indexed else None
+        if indexed and indexed[2] == digest:
+            # Touched but not modified; keep the new stat so it isn't hashed next time
+            return [stat.st_size, stat.st_mtime_ns, digest, previous_document], False
+
+        print(f"Uploading: {file_name} from {file_path}")
+
+        # Map the file extension to a mime type, defaulting to plain text if it is not mapped
+        dot, _, ext = file_name.rpartition('.')
+        file_ext = '.' + ext.lower() if dot else ''
+        upload_config = {'display_name': file_name, 'mime_type': mime_type_map.get(file_ext, 'text/plain')}
+        if chunking_config:
+            upload_config['chunking_config'] = chunking_config
+
+        # This call should return a long-running operation
+        operation = await asyncio.to_thread(
+            _call_with_retry,
+            client.file_search_stores.upload_to_file_search_store,
+            max_retries,
+            file_search_store_name=store.name,
+            file=file_path,
+            config=upload_config
+        )
+
+        # Poll with a doubling delay so small files finish quickly without hammering the API
+        delay = poll_initial
+        while not operation.done:
+            await asyncio.sleep(delay)
+            operation = await asyncio.to_thread(_call_with_retry, client.operations.get, max_retries, operation=operation)
+            delay = min(delay * 2, poll_max)
+        # A failed upload must not reach the manifest, or later runs would skip it as unchanged
+        if operation.error:
+            raise RuntimeError(f"Indexing failed: {operation.error.get('message', operation.error)}")
+        document_name = operation.response.document_name if operation.response else None
+        # The old document is only removed once the new one is indexed, so a failed upload
+        # never leaves the file missing from the store
+        if previous_document and previous_document != document_name:
+            await _delete_document(client, previous_document, max_retries)
+        return [stat.st_size, stat.st_mtime_ns, digest, document_name], True
+
+
+def _chunking_config(config):
+    """
+    Returns the chunking config for uploads from the ingestion settings, or None to let the
+    file search store use its default chunk size.
+    """
+    max_tokens = config["ingestion"].get("max_tokens_per_chunk")
+    if not max_tokens:
+        return None
+    return {
+        'white_space_config': {
+            'max_tokens_per_chunk': max_tokens,
+            'max_overlap_tokens': config["ingestion"].get("max_overlap_tokens", 0),
+        }
+    }
+
+
+# Directories that never hold source worth indexing: VCS metadata, virtual environments,
+# dependency caches, and build output. ingestion.ignored_directories adds to these.
+IGNORED_DIRS = frozenset({
+    ".git", "__pycache__", "venv", ".venv", "node_modules", ".idea", ".vscode", ".gradio",
+    "dist", "build", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox",
+    "target", ".next", ".cache",
+})
+
+
+def _ignored_dirs(config):
+    """Returns the built-in ignored directories together with those listed in the config."""
+    return IGNORED_DIRS | frozenset(config["ingestion"].get("ignored_directories", []))
+
+
+def _iter_files(root, ignored_dirs, ignored_files):
+    """
+    Lazily walks a directory tree with os.scandir and yields a DirEntry for every file
+    to ingest, skipping ignored directories, ignored files, and hidden files.
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, don't follow symlinked directories
+                        if entry.name not in ignored_dirs and not entry.is_symlink():
+                            stack.append(entry.path)
+                    elif not entry.name.startswith('.') and entry.name not in ignored_files:
+                        yield entry
+        except OSError as e:
+            print(f"Skipping unreadable directory: {e}")
+
+
+# Minimum time between progress updates sent to the UI while ingesting
+_PROGRESS_INTERVAL_SECONDS = 0.1
 
 
-def ingest_files(directory_path, client, store, config):
+def _next_files(files, count, max_file_size):
     """
-    Finds all files in a directory, uploads them to the file search store,
+    Pulls up to count uploadable files from the directory walk, as (entry, stat) pairs, along
+    with any files passed over for exceeding max_file_size. The walk and stat calls block,
+    so this runs in a worker thread.
+    """
+    batch, too_large = [], []
+    while len(batch) < count:
+        entry = next(files, None)
+        if entry is None:
+            break
+        # DirEntry caches its stat result, so the walk and the manifest check share one call
+        try:
+            stat = entry.stat()
+        except OSError:
+            stat = None
+        if stat and stat.st_size > max_file_size:
+            too_large.append((entry, stat))
+        else:
+            batch.append((entry, stat))
+    return batch, too_large
+
+
+async def ingest_files(directory_path, client, store, config):
+    """
+    Finds all files in a directory, uploads them to the file search store concurrently,
     yields progress, and waits for completion.
     """
     if not directory_path or not os.path.isdir(directory_path):
@@ -39,115 +314,161 @@ def ingest_files(directory_path, client, store, config):
     yield log(f"Scanning directory: {directory_path}")
     print(f"Scanning directory: {directory_path}")
 
-    # Find all files in the directory
-    all_files = []
-    ignored_dirs = config["ingestion"]["ignored_directories"]
-    ignored_files = config["ingestion"].get("ignored_files", [])
-    for root, dirs, files in os.walk(directory_path):
-        # Remove ignored directories from the search
-        dirs[:] = [d for d in dirs if d not in ignored_dirs]
-        for file in files:
-            if file.startswith('.'):
-                continue
-            if file in ignored_files:
-                continue
-            all_files.append(os.path.join(root, file))
+    ignored_dirs = _ignored_dirs(config)
+    ignored_files = frozenset(config["ingestion"].get("ignored_files", []))
+    root = os.path.abspath(directory_path)
+    files = _iter_files(root, ignored_dirs, ignored_files)
+
+    # Upload and index several files at once; the work is network-bound. Files are
+    # submitted as they are discovered, keeping only a bounded number in flight.
+    # Files whose contents were already indexed into this store are skipped, and files
+    # too large to index (typically binaries) are never read.
+    max_workers = config["ingestion"].get("max_workers", 8)
+    max_retries = config["ingestion"].get("max_retries", 5)
+    poll_initial = config["ingestion"].get("poll_initial", 0.25)
+    poll_max = config["ingestion"].get("poll_max", 8.0)
+    chunking_config = _chunking_config(config)
+    max_file_size = config["ingestion"].get("max_file_size_mb", 100) * 1024 * 1024
+    mime_type_map = config.get("mime_type_map", {})
+    # File system work runs in worker threads so it never stalls the server's event loop
+    manifest = await asyncio.to_thread(_load_manifest, store.name, chunking_config)
+    discovered, indexed, skipped, failed, removed = 0, 0, 0, 0, 0
+    manifest_changed = False
+    latest = None
+    last_yield_time = time.monotonic()
+    semaphore = asyncio.Semaphore(max_workers)
+    tasks = {}
+    seen = set()
+
+    async def submit_next(count):
+        nonlocal discovered
+        batch, too_large = await asyncio.to_thread(_next_files, files, count, max_file_size)
+        seen.update(entry.path for entry, _ in batch + too_large)
+        for entry, stat in too_large:
+            log(f"Skipping `{entry.name}`: larger than {max_file_size // (1024 * 1024)} MB")
+            print(f"Skipping {entry.path}: {stat.st_size} bytes")
+        for entry, stat in batch:
+            discovered += 1
+            task = asyncio.create_task(
+                _upload_one(entry.path, stat, client, store, mime_type_map, semaphore, manifest.get(entry.path), max_retries, poll_initial, poll_max, chunking_config)
+            )
+            tasks[task] = entry.path
 
-    if not all_files:
+    try:
+        await submit_next(max_workers * 2)
+        if tasks:
+            yield log("Ingesting files as they are found... This may take a few minutes.")
+            print(f"Ingesting files from {directory_path}...")
+
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            failed_before = failed
+            for task in done:
+                file_path = tasks.pop(task)
+                file_name = latest = os.path.basename(file_path)
+                try:
+                    record, uploaded = task.result()
+                    if record != manifest.get(file_path):
+                        manifest[file_path] = record
+                        manifest_changed = True
+                    if uploaded:
+                        indexed += 1
+                        print(f"Indexed: {file_name}")
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    failed += 1
+                    log(f"❌ Error indexing `{file_name}`: {e}")
+                    print(f"Error indexing {file_name}: {e}")
+            await submit_next(len(done))
+            # Report a single aggregate status line rather than one line per file, and
+            # only as often as is useful to watch; errors and the last file are always shown.
+            now = time.monotonic()
+            if now - last_yield_time >= _PROGRESS_INTERVAL_SECONDS or failed > failed_before or not tasks:
+                last_yield_time = now
+                yield "\n".join(log_messages + [
+                    f"Indexed {indexed + skipped}/{discovered} files found so far ({skipped} unchanged, {failed} failed). Latest: `{latest}`"
+                ])
+
+        # The walk is complete, so indexed files under this directory that it no longer
+        # found were deleted; remove their documents from the store as well
+        vanished = [
+            path for path in manifest
+            if path.startswith(root + os.sep) and path not in seen
+            and not await asyncio.to_thread(os.path.exists, path)
+        ]
+        for path in vanished:
+            document_name = manifest[path][3]
+            if document_name and not await _delete_document(client, document_name, max_retries):
+                continue
+            del manifest[path]
+            manifest_changed = True
+            removed += 1
+            log(f"🗑 Removed `{os.path.basename(path)}` from the store")
+            print(f"Removed deleted file from the store: {path}")
+        if removed:
+            yield "\n".join(log_messages)
+    finally:
+        # Stop outstanding uploads and record progress if ingestion is interrupted
+        for task in tasks:
+            task.cancel()
+        if manifest_changed:
+            await asyncio.to_thread(_save_manifest, store.name, chunking_config, manifest)
+
+    # The indexed corpus changed, so previously cached answers may be stale
+    if indexed or removed:
+        invalidate_semantic_cache()
+
+    if not discovered:
         yield "No files found in the specified directory."
         yield log("No files found in the specified directory.")
         return
 
-    yield f"Found {len(all_files)} files. Ingesting... This may take a few minutes."
-    yield log(f"Found {len(all_files)} files. Ingesting... This may take a few minutes.")
-    print(f"Ingesting {len(all_files)} files...")
+    final_message = f"✅ Ingestion complete for {discovered} files. You can now use the Chat tab."
+    yield final_message
+    yield log(f"✅ Ingestion complete for {discovered} files. You can now use the Chat tab.")
 
-    # Process one file at a time
-    for file_path in all_files:
-        file_name = os.path.basename(file_path)
-        yield f"Uploading `{file_name}`..."
-        yield log(f"Uploading `{file_name}`...")
-        print(f"Uploading: {file_name} from {file_path}")
 
-        try:
-            upload_config = {'display_name': file_name}
+def _read_json(path):
+    """Parses a JSON file, with orjson when it is available."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-            # Get file extension and map to mime type
-            mime_type_map = config.get("mime_type_map", {})
-            file_ext = os.path.splitext(file_name)[1].lower()
 
-            if file_ext in mime_type_map:
-                upload_config['mime_type'] = mime_type_map[file_ext]
-            else:
-                # Default to plain text if mime type is not mapped
-                upload_config['mime_type'] = 'text/plain'
-
-            # This call should return a long-running operation
-            operation = client.file_search_stores.upload_to_file_search_store(
-                file_search_store_name=store.name,
-                file=file_path,
-                config=upload_config
-            )
+def _dump_json(data, indent=False):
+    """Serializes data to JSON bytes, with orjson when it is available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(data, indent=2 if indent else None).encode('utf-8')
 
-            # Wait for the current file's operation to complete before proceeding
-            yield f"Indexing `{file_name}`..."
-            yield log(f"Indexing `{file_name}`...")
-            while not operation.done:
-                time.sleep(4)
-                operation = client.operations.get(operation)
 
-            yield f"✅ Indexed `{file_name}`"
-            yield log(f"✅ Indexed `{file_name}`")
-        except Exception as e:
-            yield f"❌ Error indexing `{file_name}`: {e}"
-            yield log(f"❌ Error indexing `{file_name}`: {e}")
-            print(f"Error indexing {file_name}: {e}")
+# Bump when CodeAnalyzer's output changes, so cached per-file results are discarded
+_GRAPH_CACHE_VERSION = 2
 
-    final_message = f"✅ Ingestion complete for {len(all_files)} files. You can now use the Chat tab."
-    yield final_message
-    yield log(f"✅ Ingestion complete for {len(all_files)} files. You can now use the Chat tab.")
 
+def _load_graph_cache(cache_path):
+    """Returns cached [size, mtime_ns, nodes, edges, error] analysis results, keyed by absolute path."""
+    try:
+        cache = _read_json(cache_path)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != _GRAPH_CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
 
-class CodeAnalyzer(ast.NodeVisitor):
-    """
-    An AST node visitor that extracts nodes (files, functions, classes)
-    and edges (imports, calls) from Python code.
-    """
-    def __init__(self, file_name):
-        self.file_name = file_name
-        self.nodes = []
-        self.edges = []
-        self.current_scope = file_name  # Start with file-level scope
-
-    def visit_FunctionDef(self, node):
-        self.nodes.append({"id": node.name, "type": "function", "file": self.file_name})
-        parent_scope = self.current_scope
-        self.current_scope = node.name
-        self.generic_visit(node)
-        self.current_scope = parent_scope
-
-    def visit_ClassDef(self, node):
-        self.nodes.append({"id": node.name, "type": "class", "file": self.file_name})
-        parent_scope = self.current_scope
-        self.current_scope = node.name
-        self.generic_visit(node)
-        self.current_scope = parent_scope
-
-    def visit_Import(self, node):
-        for alias in node.names:
-            self.edges.append({"source": self.file_name, "target": alias.name, "type": "imports"})
-        self.generic_visit(node)
-
-    def visit_ImportFrom(self, node):
-        if node.module:
-            self.edges.append({"source": self.file_name, "target": node.module, "type": "imports"})
-        self.generic_visit(node)
-
-    def visit_Call(self, node):
-        # This is a simplified call analysis. It captures direct function names.
-        if isinstance(node.func, ast.Name):
-            self.edges.append({"source": self.current_scope, "target": node.func.id, "type": "calls"})
-        self.generic_visit(node)
+
+def _save_graph_cache(cache_path, files):
+    """Atomically rewrites the per-file analysis cache."""
+    temp_path = cache_path + ".tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(_dump_json({"version": _GRAPH_CACHE_VERSION, "files": files}))
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write knowledge graph cache: {e}")
 
 
 def build_knowledge_graph(directory_path, config):
@@ -166,18 +487,13 @@ def build_knowledge_graph(directory_path, config):
         return "\n".join(log_messages)
 
     yield log(f"Scanning directory for graph construction: {directory_path}")
-    python_files = []
-    ignored_dirs = config["ingestion"]["ignored_directories"]
-    ignored_files = config["ingestion"].get("ignored_files", [])
-    for root, dirs, files in os.walk(directory_path):
-        dirs[:] = [d for d in dirs if d not in ignored_dirs]
-        for file in files:
-            if file.startswith('.'):
-                continue
-            if file in ignored_files:
-                continue
-            if file.endswith(".py"):
-                python_files.append(os.path.join(root, file))
+    ignored_dirs = _ignored_dirs(config)
+    ignored_files = frozenset(config["ingestion"].get("ignored_files", []))
+    python_entries = [
+        entry for entry in _iter_files(directory_path, ignored_dirs, ignored_files)
+        if entry.name.endswith(".py")
+    ]
+    python_files = [entry.path for entry in python_entries]
 
     if not python_files:
         yield "No Python (.py) files found to build graph."
@@ -188,46 +504,75 @@ def build_knowledge_graph(directory_path, config):
     yield log(f"Found {len(python_files)} Python files. Building knowledge graph...")
     knowledge_graph = {"nodes": [], "edges": []}
     existing_node_ids = set()
+    existing_edges = set()  # (source, target, type) of every edge added
 
-    for file_path in python_files:
-        file_name = os.path.basename(file_path)
-        yield f"Analyzing `{file_name}`..."
-        yield log(f"Analyzing `{file_name}`...")
+    # Reuse the analysis of files whose size and mtime are unchanged since the last build
+    graph_file_path = config["knowledge_graph"]["graph_file_path"]
+    cache_path = graph_file_path + ".cache.json"
+    cached_files = _load_graph_cache(cache_path)
+    file_keys, file_stats, stale_files = [], [], []
+    for entry in python_entries:
+        key = os.path.abspath(entry.path)
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            stat = entry.stat()
+            stat = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            stat = None
+        cached = cached_files.get(key)
+        if not (stat and cached and tuple(cached[:2]) == stat):
+            stale_files.append(entry.path)
+        file_keys.append(key)
+        file_stats.append(stat)
+
+    # Parsing is CPU-bound, so changed files are analyzed in worker processes. Results arrive
+    # in file order, and only this process merges them into the graph.
+    updated_cache = {}
+    max_workers = max(1, min(config["knowledge_graph"].get("max_workers") or os.cpu_count() or 1, len(stale_files)))
+    chunksize = max(1, min(32, len(stale_files) // (max_workers * 4)))
+    # Forking the multi-threaded server can deadlock, so workers come from a fork server
+    mp_context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        fresh_results = executor.map(analyze_file, stale_files, chunksize=chunksize)
+        for file_path, key, stat in zip(python_files, file_keys, file_stats):
+            cached = cached_files.get(key)
+            if stat and cached and tuple(cached[:2]) == stat:
+                nodes, edges, error = cached[2:]
+            else:
+                nodes, edges, error = next(fresh_results)
+            if stat:
+                updated_cache[key] = [*stat, nodes, edges, error]
+
+            file_name = os.path.basename(file_path)
+            yield f"Analyzing `{file_name}`..."
+            yield log(f"Analyzing `{file_name}`...")
 
-            if not content.strip():
+            if nodes is None:
                 yield f"Skipping empty file: `{file_name}`"
                 yield log(f"Skipping empty file: `{file_name}`")
                 continue
 
-            # Add the file itself as a node
-            if file_name not in existing_node_ids:
-                knowledge_graph["nodes"].append({"id": file_name, "type": "file", "file": file_name})
-                existing_node_ids.add(file_name)
-
-            # Parse the code and analyze it
-            tree = ast.parse(content)
-            analyzer = CodeAnalyzer(file_name)
-            analyzer.visit(tree)
-
             # Aggregate nodes and edges, avoiding duplicates
-            for node in analyzer.nodes:
+            for node in nodes:
                 if node.get("id") not in existing_node_ids:
                     knowledge_graph["nodes"].append(node)
                     existing_node_ids.add(node.get("id"))
-            knowledge_graph["edges"].extend(analyzer.edges)
+            for edge in edges:
+                edge_key = (edge["source"], edge["target"], edge["type"])
+                if edge_key not in existing_edges:
+                    knowledge_graph["edges"].append(edge)
+                    existing_edges.add(edge_key)
 
-        except Exception as e:
-            yield f"❌ Error analyzing `{file_name}`: {e}"
-            yield log(f"❌ Error analyzing `{file_name}`: {e}")
-            print(f"Error analyzing {file_name}: {e}")
+            if error:
+                yield f"❌ Error analyzing `{file_name}`: {error}"
+                yield log(f"❌ Error analyzing `{file_name}`: {error}")
+                print(f"Error analyzing {file_name}: {error}")
+
+    # Files that no longer exist are dropped from the cache
+    _save_graph_cache(cache_path, updated_cache)
 
-    graph_file_path = config["knowledge_graph"]["graph_file_path"]
     try:
-        with open(graph_file_path, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_graph, f, indent=2)
+        with open(graph_file_path, 'wb') as f:
+            f.write(_dump_json(knowledge_graph, indent=True))
         yield f"✅ Knowledge graph built successfully and saved to `{graph_file_path}`."
         yield log(f"✅ Knowledge graph built successfully and saved to `{graph_file_path}`.")
     except Exception as e:
@@ -247,10 +592,9 @@ def view_knowledge_graph(config):
         return gr.update(visible=False), f"❌ Error: Knowledge graph file not found at `{graph_file_path}`. Please build it first."
 
     try:
-        with open(graph_file_path, 'r', encoding='utf-8') as f:
-            graph_data = json.load(f)
+        graph_data = _read_json(graph_file_path)
         # Format the dictionary as a nicely indented JSON string for the gr.Code component
-        json_string = json.dumps(graph_data, indent=2)
+        json_string = _dump_json(graph_data, indent=True).decode('utf-8')
         return gr.update(value=json_string, visible=True), "✅ Knowledge graph loaded."
     except Exception as e:
         error_message = f"❌ Error reading or parsing knowledge graph file: {e}"
@@ -269,11 +613,16 @@ def create_ingest_ui(client, store, config):
             view_graph_button = gr.Button("👁️ View Graph", variant="secondary")
         ingest_status = gr.Textbox(label="Status", interactive=False, lines=8, show_copy_button=True)
 
+        async def ingest_fn(path, cfg):
+            async for update in ingest_files(path, client, store, cfg):
+                yield update
+
         ingest_button.click(
-            fn=lambda path, cfg: (yield from ingest_files(path, client, store, cfg)),
+            fn=ingest_fn,
             inputs=[local_repo_path, gr.State(config)],
             outputs=[ingest_status],
-            show_progress="hidden"
+            show_progress="hidden",
+            concurrency_limit=config.get("server", {}).get("ingest_concurrency_limit", 2)
         )
 
         build_graph_button.click(